@@ -28,7 +28,9 @@ QGIS Plugin for Bend reduction
 
 import math
 import sys
+import heapq
 from abc import ABC, abstractmethod
+import numpy as np
 from qgis.core import (QgsLineString, QgsWkbTypes, QgsSpatialIndex, QgsGeometry, QgsPolygon,
                        QgsGeometryUtils, QgsRectangle, QgsProcessingException)
 
@@ -98,15 +100,17 @@ class ProgressBar:
     def __init__(self, feedback, max_value, message=None):
         """Constructor of the ProgressBar class
 
-        :param: feedback: feedback handle for interaction with the QGIS desktop
+        :param: feedback: feedback handle for interaction with the QGIS desktop; None to disable the progress bar
         :param: max_value: Integer of the maximum value """
 
         self.feedback = feedback
         self.max_value  = max_value
         self.progress_bar_value = 0
-        self.feedback.setProgress(self.progress_bar_value)
-        if message is not None or message != "":
-            self.feedback.pushInfo(message)
+        self.next_value = 0  # Next value at which the percentage of the progress bar changes
+        if self.feedback is not None:
+            self.feedback.setProgress(self.progress_bar_value)
+            if message is not None or message != "":
+                self.feedback.pushInfo(message)
 
     def set_value(self, value):
         """Set the value of the progress bar
@@ -115,10 +119,15 @@ class ProgressBar:
 
         """
 
-        percent_value = int(value/self.max_value*100.)
-        if percent_value != self.progress_bar_value:
-            self.progress_bar_value = percent_value
-            self.feedback.setProgress(self.progress_bar_value)
+        if value >= self.next_value:
+            percent_value = int(value/self.max_value*100.)
+            # Smallest value that can give the next percentage (integer ceiling of (percent+1) * max_value / 100).
+            # Until then the percentage cannot change and is not evaluated
+            self.next_value = ((percent_value+1)*self.max_value + 99) // 100
+            if percent_value != self.progress_bar_value:
+                self.progress_bar_value = percent_value
+                if self.feedback is not None:
+                    self.feedback.setProgress(self.progress_bar_value)
 
 
 
@@ -165,14 +174,14 @@ class GsCollection:
 
         return id_segment, qgs_geom.boundingBox()
 
-    def add_features(self, rb_geoms, feedback):
+    def add_features(self, rb_geoms, feedback=None):
         """Add a RbGeom object in the spatial index.
 
         For the LineString geometries. The geometry is broken into each line segment that are individually
         loaded in the QgsSpatialIndex.  This strategy accelerate the validation of the spatial constraints.
 
         :param: rb_geoms: List of RbGeom to load in the QgsSpatialIndex
-        :feedback: QgsFeedback handle used to update the progress bar
+        :feedback: QgsFeedback handle used to update the progress bar; None for no progress bar
         """
 
         progress_bar = ProgressBar(feedback, len(rb_geoms), "Building internal structure...")
@@ -259,52 +268,53 @@ class GsCollection:
         """Delete consecutive vertex in the line and update the spatial index.
 
         When a vertex in a line string is deleted.  Two line segments are deleted and one line segment is
-        created in the spatial index.  Cannot delete the first/last vertex of a line string
+        created in the spatial index.  Cannot delete the first/last vertex of an open line string.  For a closed
+        line string the vertice are managed as a circular array so the range can start at the first vertex or
+        wrap around the first/last vertex (v_id_start greater than v_id_end)
 
         :param rb_geom: LineString object to update.
         :param v_id_start: start of the vertex to delete.
         :param v_id_end: end of the vertex to delete.
         """
 
-        is_closed = rb_geom.qgs_geom.constGet().isClosed()
-        v_ids_to_del = list(range(v_id_start, v_id_end+1))
-        if v_id_start == 0 and is_closed:
+        qgs_points = rb_geom.qgs_points
+        is_circular = (v_id_start == 0 or v_id_start > v_id_end) and rb_geom.qgs_geom.constGet().isClosed()
+        if is_circular:
             # Special case for closed line where we simulate a circular array
-            nbr_vertice = rb_geom.qgs_geom.constGet().numPoints()
-            v_ids_to_del.insert(0, nbr_vertice - 2)
+            nbr_ring = len(qgs_points) - 1  # Last vertex is the same as the first vertex
+            nbr_to_del = (v_id_end - v_id_start) % nbr_ring + 1
+            v_ids_to_del = [(v_id_start-1+i) % nbr_ring for i in range(nbr_to_del+2)]
         else:
-            v_ids_to_del.insert(0, v_ids_to_del[0]-1)
-        v_ids_to_del.append(v_ids_to_del[-1]+1)
+            v_ids_to_del = list(range(v_id_start-1, v_id_end+2))
 
         # Delete the line segment in the spatial index
         for i in range(len(v_ids_to_del)-1):
-            qgs_pnt0 = rb_geom.qgs_geom.vertexAt(v_ids_to_del[i])
-            qgs_pnt1 = rb_geom.qgs_geom.vertexAt(v_ids_to_del[i+1])
-            self._delete_segment(rb_geom.id, qgs_pnt0, qgs_pnt1)
+            self._delete_segment(rb_geom.id, qgs_points[v_ids_to_del[i]], qgs_points[v_ids_to_del[i+1]])
 
         # Add the new line segment in the spatial index
-        qgs_pnt0 = rb_geom.qgs_geom.vertexAt(v_ids_to_del[0])
-        qgs_pnt1 = rb_geom.qgs_geom.vertexAt(v_ids_to_del[-1])
-        qgs_geom_segment = QgsGeometry(QgsLineString(qgs_pnt0, qgs_pnt1))
+        qgs_geom_segment = QgsGeometry(QgsLineString(qgs_points[v_ids_to_del[0]], qgs_points[v_ids_to_del[-1]]))
         geom_id, qgs_rectangle = self._create_rectangle(rb_geom.id, qgs_geom_segment)
         self._spatial_index.addFeature(geom_id, qgs_rectangle)
 
         # Delete the vertex in the line string geometry
-        for v_id_to_del in reversed(range(v_id_start, v_id_end+1)):
-            rb_geom.qgs_geom.deleteVertex(v_id_to_del)
-            if v_id_start == 0 and is_closed:
-                # Special case for closed line where we simulate a circular array
-                nbr_vertice = rb_geom.qgs_geom.constGet().numPoints()
-                qgs_pnt_first = rb_geom.qgs_geom.vertexAt(0)
-                rb_geom.qgs_geom.insertVertex(qgs_pnt_first, nbr_vertice-1)
-                rb_geom.qgs_geom.deleteVertex(nbr_vertice)
+        if is_circular:
+            # Rebuild the closed line in one step; it now starts on the first vertex following the deleted range
+            qgs_points_kept = [qgs_points[(v_id_end+1+i) % nbr_ring] for i in range(nbr_ring-nbr_to_del)]
+            qgs_points_kept.append(qgs_points_kept[0])
+            rb_geom.qgs_geom = QgsGeometry(QgsLineString(qgs_points_kept))
+            rb_geom.reset_cache()  # The start/end vertex of the closed line has moved
+        else:
+            for v_id_to_del in reversed(range(v_id_start, v_id_end+1)):
+                rb_geom.qgs_geom.deleteVertex(v_id_to_del)
+            rb_geom.delete_cache_vertex(v_id_start, v_id_end)
 
         return
 
     def delete_vertex(self, rb_geom, v_id_start, v_id_end):
         """Manage deletion of consecutives vertex.
 
-        If v_id_start is greater than v_id_end the delete is broken into up to 3 calls
+        If v_id_start is greater than v_id_end the delete wraps around the first/last vertex of the closed line
+        and is done in one call so the spatial index is updated only once for the whole range
 
         :param rb_geom: LineString object to update.
         :param v_id_start: start of the vertex to delete.
@@ -318,21 +328,7 @@ class GsCollection:
         if v_id_end == -1:
             v_id_end = num_points -2  # Preceding point the first/last vertice
 
-        if v_id_start <= v_id_end:
-            self._delete_vertex(rb_geom, v_id_start, v_id_end)
-        else:
-            self._delete_vertex(rb_geom, v_id_start, num_points-2)
-            self._delete_vertex(rb_geom, 0, 0)
-            if v_id_end > 0:
-                self._delete_vertex(rb_geom, 1, v_id_end)
-#            lst_vertex_to_del = list(range(v_id_start, num_points)) + list(range(0, v_id_end+1))
-#            for vertex_to_del in lst_vertex_to_del:
-#                self._delete_vertex(rb_geom, vertex_to_del, vertex_to_del)
-
-#        num_points = rb_geom.qgs_geom.constGet().numPoints()
-#        lst_vertex_to_del = list(range(v_id_start, num_points)) + list(range(0, v_id_end + 1))
-#        for vertex_to_del in lst_vertex_to_del:
-#            self._delete_vertex(rb_geom, vertex_to_del, vertex_to_del)
+        self._delete_vertex(rb_geom, v_id_start, v_id_end)
 
     def add_vertex(self, rb_geom, bend_i, bend_j, qgs_geom_new_subline):
         """Update the line segment in the spatial index
@@ -354,6 +350,7 @@ class GsCollection:
         # Insert the new vertex in the QgsGeometry. Work reversely to facilitate insertion
         for qgs_point in reversed(tmp_qgs_points):
             rb_geom.qgs_geom.insertVertex(qgs_point, bend_j)
+        rb_geom.reset_cache()
 
         # Add the new segment in the spatial container
         for i in range(len(qgs_points)-1):
@@ -385,13 +382,14 @@ class GsCollection:
                     self._delete_segment(rb_geom.id, qgs_points[i], qgs_points[i+1])
 
         if is_structure_valid:
-            # Verify that there are no other feature in the spatial index; except for QgsPoint
+            # Verify that there are no other feature in the spatial index; except for QgsPoint.  The deleted segments
+            # stay in the spatial index but are flagged as deleted in the internal structure
             qgs_rectangle = QgsRectangle(-sys.float_info.max, -sys.float_info.max,
                                          sys.float_info.max, sys.float_info.max)
             feat_ids = self._spatial_index.intersects(qgs_rectangle)
             for feat_id in feat_ids:
-                qgs_geom = self._spatial_index.geometry(feat_id)
-                if qgs_geom.wkbType() == QgsWkbTypes.Point:
+                target_qgs_geom_id, target_qgs_geom = self._dict_qgs_segment[feat_id]
+                if target_qgs_geom_id is None or target_qgs_geom.wkbType() == QgsWkbTypes.Point:
                     pass
                 else:
                     # Error
@@ -622,7 +620,8 @@ class GsPoint(GsFeature):
 class RbGeom:
     """Class defining the line string used for the bend reduction"""
 
-    __slots__ = ('id', 'original_geom_type', 'is_simplest', 'qgs_geom', 'bends', 'need_pivot')
+    __slots__ = ('id', 'original_geom_type', 'is_simplest', 'qgs_geom', 'bends', 'need_pivot', 'init_stack',
+                 '_qgs_points', '_xy')
 
     _id_counter = 0  # Unique ID counter
 
@@ -654,6 +653,9 @@ class RbGeom:
         self.is_simplest = False
         self.need_pivot = False
         self.bends = None
+        self.init_stack = None  # Method initializing the simplification of the line (open or closed)
+        self._qgs_points = None
+        self._xy = None
         # Set some variable depending on the geometry of the feature
         if self.original_geom_type == QgsWkbTypes.Point:
             self.is_simplest = True  # A point cannot be simplified
@@ -665,6 +667,50 @@ class RbGeom:
             else:
                 self.is_simplest = True  # Degenerated LineString... Do not try to simplify...
 
+    @property
+    def qgs_points(self):
+        """Late attribute evaluation as this attribute is costly to evaluate"""
+        if self._qgs_points is None:
+            self._qgs_points = self.qgs_geom.constGet().points()
+        return self._qgs_points
+
+    @property
+    def xy(self):
+        """Late attribute evaluation of the coordinates as an array of shape (2,N); xy[0] are the X and xy[1] the Y"""
+        if self._xy is None:
+            qgs_points = self.qgs_points
+            self._xy = np.array([[qgs_point.x() for qgs_point in qgs_points],
+                                 [qgs_point.y() for qgs_point in qgs_points]], dtype=np.float64).reshape(2, -1)
+        return self._xy
+
+    def reset_cache(self):
+        """Reset the attributes derived from the geometry.  Must be called each time the geometry is modified.
+
+        :return: None
+        :rtype: None
+        """
+
+        self._qgs_points = None
+        self._xy = None
+
+        return
+
+    def delete_cache_vertex(self, v_id_start, v_id_end):
+        """Update the attributes derived from the geometry after the deletion of consecutive vertex.
+
+        :param v_id_start: start of the vertex deleted.
+        :param v_id_end: end of the vertex deleted.
+        :return: None
+        :rtype: None
+        """
+
+        if self._qgs_points is not None:
+            del self._qgs_points[v_id_start:v_id_end+1]
+        if self._xy is not None:
+            self._xy = np.delete(self._xy, np.s_[v_id_start:v_id_end+1], axis=1)
+
+        return
+
 
 class SimGeom:
     """Class defining the line string used for the douglas peucker simplification"""
@@ -800,20 +846,111 @@ class GeoSimUtil:
     """Class containing a list general static method"""
 
     @staticmethod
-    def validate_simplicity(qgs_geoms_with_itself, qgs_geom_new_subline):
+    def create_b_box_index(rb_geoms):
+        """Create a spatial index of the bounding box of each RbGeom
+
+        Two geometries can interact when their bounding boxes intersect.  As the simplification only deletes vertices,
+        the bounding boxes can only shrink and the index created before the simplification remains valid.
+
+        :param: rb_geoms: List of RbGeom
+        :return: Spatial index of the bounding boxes (the ID is the index of the RbGeom) and the bounding boxes
+        :rtype: tuple of QgsSpatialIndex and [QgsRectangle]
+        """
+
+        b_box_index = QgsSpatialIndex()
+        b_boxes = []
+        for i, rb_geom in enumerate(rb_geoms):
+            b_box = rb_geom.qgs_geom.boundingBox()
+            b_box.grow(Epsilon.ZERO_RELATIVE*100.)  # Same growth as the one used to search the spatial index
+            b_boxes.append(b_box)
+            b_box_index.addFeature(i, b_box)
+
+        return b_box_index, b_boxes
+
+    @staticmethod
+    def partition_rb_geoms(b_box_index, b_boxes):
+        """Partition the RbGeom into groups of geometries that cannot interact with each other
+
+        A group contains all the geometries linked together by a chain of intersecting bounding boxes, so the spatial
+        constraints of a geometry only depend on the geometries of its own group.
+
+        :param: b_box_index: Spatial index of the bounding boxes of the RbGeom as created by create_b_box_index
+        :param: b_boxes: Bounding boxes of the RbGeom as created by create_b_box_index
+        :return: List of groups of index of RbGeom.  The order of the RbGeom is preserved within each group
+        :rtype: [[int]]
+        """
+
+        # Merge the geometries with intersecting bounding boxes (union-find); the root is the smallest index
+        parents = list(range(len(b_boxes)))
+        for i, b_box in enumerate(b_boxes):
+            for j in b_box_index.intersects(b_box):
+                root_i = GeoSimUtil._find_root(parents, i)
+                root_j = GeoSimUtil._find_root(parents, j)
+                if root_i != root_j:
+                    parents[max(root_i, root_j)] = min(root_i, root_j)
+
+        dict_groups = {}
+        for i in range(len(b_boxes)):
+            dict_groups.setdefault(GeoSimUtil._find_root(parents, i), []).append(i)
+
+        return list(dict_groups.values())
+
+    @staticmethod
+    def pack_groups(groups, weights, nbr_bins):
+        """Pack the groups of geometries in a maximum number of bins of about the same weight
+
+        The groups are placed from the heaviest to the lightest in the lightest bin (greedy bin packing).
+
+        :param: groups: List of groups of index of RbGeom as created by partition_rb_geoms
+        :param: weights: Weight of each RbGeom (number of vertices)
+        :param: nbr_bins: Maximum number of bins
+        :return: List of bins of index of RbGeom.  The index are sorted within each bin to preserve the order of the
+                 RbGeom
+        :rtype: [[int]]
+        """
+
+        group_weights = [sum(weights[i] for i in group) for group in groups]
+        heap_bins = [(0, i, []) for i in range(min(len(groups), nbr_bins))]
+        for j in sorted(range(len(groups)), key=lambda j: group_weights[j], reverse=True):
+            bin_weight, i, lst_index = heapq.heappop(heap_bins)
+            lst_index.extend(groups[j])
+            heapq.heappush(heap_bins, (bin_weight+group_weights[j], i, lst_index))
+
+        return [sorted(lst_index) for _, _, lst_index in sorted(heap_bins, key=lambda heap_bin: heap_bin[1])]
+
+    @staticmethod
+    def _find_root(parents, i):
+        """Find the root of an element in a union-find structure and compress the path to the root
+
+        :param: parents: List of the parent of each element
+        :param: i: Index of the element
+        :return: Index of the root of the element
+        :rtype: int
+        """
+
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+
+        return i
+
+    @staticmethod
+    def validate_simplicity(qgs_geoms_with_itself, qgs_geom_new_subline, geom_engine_subline=None):
         """Validate the simplicitity constraint
 
         This constraint assure that the new sub line is not intersecting with any other segment of the same line
 
         :param: qgs_geoms_with_itself: List of QgsLineString segment to verify for self intersection
         :param: qgs_geom_new_subline: New QgsLineString replacement sub line.
+        :param: geom_engine_subline: QgsGeometryEngine of the new sub line; created when not given
         :return: Flag indicating if the spatial constraint is valid
         :rtype: Bool
         """
 
         constraints_valid = True
         if qgs_geom_new_subline.length() > Epsilon.ZERO_RELATIVE:
-            geom_engine_subline = QgsGeometry.createGeometryEngine(qgs_geom_new_subline.constGet().clone())
+            if geom_engine_subline is None:
+                geom_engine_subline = QgsGeometry.createGeometryEngine(qgs_geom_new_subline.constGet().clone())
             for qgs_geom_potential in qgs_geoms_with_itself:
                 de_9im_pattern = geom_engine_subline.relate(qgs_geom_potential.constGet().clone())
                 # de_9im_pattern[0] == '0' means that their interiors intersect (crosses)
@@ -828,20 +965,22 @@ class GeoSimUtil:
         return constraints_valid
 
     @staticmethod
-    def validate_intersection(qgs_geoms_with_others, qgs_geom_new_subline):
+    def validate_intersection(qgs_geoms_with_others, qgs_geom_new_subline, geom_engine_subline=None):
         """Validate the intersection constraint
 
         This constraint assure that the new sub line is not intersecting with any other lines (not itself)
 
         :param: qgs_geoms_with_others: List of QgsLineString segment to verify for intersection
         :param: qgs_geom_new_subline: New QgsLineString replacement sub line.
+        :param: geom_engine_subline: QgsGeometryEngine of the new sub line; created when not given
         :return: Flag indicating if the spatial constraint is valid
         :rtype: Bool
         """
 
         constraints_valid = True
         if len(qgs_geoms_with_others) >= 1:
-            geom_engine_subline = QgsGeometry.createGeometryEngine(qgs_geom_new_subline.constGet().clone())
+            if geom_engine_subline is None:
+                geom_engine_subline = QgsGeometry.createGeometryEngine(qgs_geom_new_subline.constGet().clone())
             for qgs_geom_potential in qgs_geoms_with_others:
                 de_9im_pattern = geom_engine_subline.relate(qgs_geom_potential.constGet().clone())
                 # de_9im_pattern[0] == '0' means that their interiors intersect (crosses)
@@ -851,6 +990,57 @@ class GeoSimUtil:
 
         return constraints_valid
 
+    @staticmethod
+    def is_ring_simple(xy, max_nbr_segment=128):
+        """Quick validation that a ring does not intersect or touch itself
+
+        Each pair of segments of the ring is compared with orientation tests on the coordinates.  The validation is
+        conservative: False is returned when the ring is not simple but also when the result is ambiguous (collinear
+        or almost touching segments) or when the ring has too many segments.  GEOS must then be used to decide.
+
+        :param: xy: Array of shape (2,N) of the coordinates of the ring; the last point is linked to the first one
+        :param: max_nbr_segment: Maximum number of segments of the ring to validate
+        :return: Flag indicating that the ring is certainly simple
+        :rtype: Bool
+        """
+
+        nbr_segment = xy.shape[1]
+        if nbr_segment < 3 or nbr_segment > max_nbr_segment:
+            return False
+
+        eps = Epsilon.ZERO_RELATIVE*100.
+        start_x, start_y = xy
+        end_x = np.roll(start_x, -1)
+        end_y = np.roll(start_y, -1)
+        seg_dx = end_x - start_x
+        seg_dy = end_y - start_y
+        seg_len = np.hypot(seg_dx, seg_dy)
+        if seg_len.min() <= eps:
+            return False  # Degenerated segment
+
+        # Signed distance of the start/end of each segment (column) from the line of each segment (row)
+        dist_start = (seg_dx[:, None]*(start_y[None, :] - start_y[:, None]) -
+                      seg_dy[:, None]*(start_x[None, :] - start_x[:, None])) / seg_len[:, None]
+        dist_end = (seg_dx[:, None]*(end_y[None, :] - start_y[:, None]) -
+                    seg_dy[:, None]*(end_x[None, :] - start_x[:, None])) / seg_len[:, None]
+
+        # Two segments are disjoint when one of them lies entirely on one side of the line of the other
+        one_side = ((dist_start > eps) & (dist_end > eps)) | ((dist_start < -eps) & (dist_end < -eps))
+        disjoint = one_side | one_side.T
+
+        # Consecutive segments share a vertex; they must not fold back on each other
+        ind = np.arange(nbr_segment)
+        ind_next = np.roll(ind, -1)
+        is_collinear = np.abs(dist_end[ind, ind_next]) <= eps
+        is_backward = seg_dx[ind]*seg_dx[ind_next] + seg_dy[ind]*seg_dy[ind_next] < 0.
+        if np.any(is_collinear & is_backward):
+            return False
+        disjoint[ind, ind] = True
+        disjoint[ind, ind_next] = True
+        disjoint[ind_next, ind] = True
+
+        return bool(disjoint.all())
+
     @staticmethod
     def validate_sidedness(qgs_geom_with_others, qgs_geom_bend):
         """Validate the sidedness constraint
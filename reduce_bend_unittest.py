@@ -26,6 +26,7 @@ Unit test for reduce_bend algorithm
 import unittest
 from qgis.core import QgsApplication
 from .reduce_bend_algorithm import ReduceBend
+from .geo_sim_util import Epsilon, GsCollection, RbGeom
 from qgis.core import QgsPoint, QgsLineString, QgsPolygon, QgsFeature, QgsGeometry, QgsProcessingFeedback, \
                       QgsVectorLayer, QgsWkbTypes, QgsPointXY
 from qgis.analysis import QgsNativeAlgorithms
@@ -686,6 +687,22 @@ class Test(unittest.TestCase):
         val1 = qgs_geom.wkbType() == QgsWkbTypes.LineString
         self.assertTrue(val0 and val1, title)
 
+    def test_case36(self):
+        title = "Test 36: Delete a range of vertices wrapping around the first/last vertex of a closed line"
+        print (title)
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        qgs_geom = create_line([(0, 0), (0, 5), (0, 10), (10, 10), (10, 0), (5, 0), (0, 0)])
+        rb_geom = RbGeom(qgs_geom, QgsWkbTypes.LineString)
+        rb_collection = GsCollection()
+        rb_collection.add_features([rb_geom])
+        rb_collection.delete_vertex(rb_geom, 5, 1)  # Delete the vertices 5, 0 (first/last) and 1
+        coords = [(qgs_point.x(), qgs_point.y()) for qgs_point in rb_geom.qgs_geom.constGet().points()]
+        # The closed line now starts on the vertex following the deleted range (old vertex 2)
+        val0 = coords == [(0, 10), (10, 10), (10, 0), (0, 10)]
+        val1 = rb_geom.xy.tolist() == [[0, 10, 10, 0], [10, 10, 0, 10]]
+        val2 = rb_collection.validate_integrity([rb_geom])
+        self.assertTrue(val0 and val1 and val2, title)
+
 
 # Supply path to qgis install location
 QgsApplication.setPrefixPath("/usr/bin/qgis", True)
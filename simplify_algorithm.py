@@ -29,14 +29,22 @@ QGIS Plugin for Simplification (Douglas-Peucker algorithm)
 
 import os
 import inspect
+import io
+import cProfile
+import pstats
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.PyQt.QtGui import QIcon
-from qgis.core import (QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterDistance,
+from qgis.core import (Qgis, QgsProcessing, QgsProcessingAlgorithm, QgsProcessingParameterDistance,
                        QgsProcessingParameterFeatureSource, QgsProcessingParameterFeatureSink,
-                       QgsFeatureSink, QgsFeatureRequest, QgsLineString, QgsWkbTypes, QgsGeometry,
-                       QgsProcessingException)
-import processing
+                       QgsFeatureSink, QgsFeatureRequest, QgsFeature, QgsLineString, QgsWkbTypes, QgsGeometry,
+                       QgsPolygon, QgsProcessingException)
 from .geo_sim_util import Epsilon, GsCollection, GeoSimUtil, GsFeature, ProgressBar
+try:
+    from numba import njit
+except ImportError:
+    njit = None  # Numba is optional; the geometric core then runs with NumPy only
 
 
 class SimplifyAlgorithm(QgsProcessingAlgorithm):
@@ -189,6 +197,11 @@ class SimplifyAlgorithm(QgsProcessingAlgorithm):
 # --------------------------------------------------------
 
 # Define global constant
+MIN_NBR_GEOMS_PARALLEL = 8  # Minimum number of geometries needed to simplify the groups of geometries in parallel
+NBR_WORKERS = os.cpu_count() or 1  # Maximum number of groups of geometries simplified in parallel
+# Before QGIS 3.34 all the threads share the same GEOS context handle, which is not thread safe
+MIN_QGIS_VERSION_PARALLEL = 33400
+CANCEL_CHECK_MASK = 0xff  # Check if the processing is canceled once every 256 geometries
 
 
 class RbResults:
@@ -220,9 +233,9 @@ class Simplify:
     def normalize_in_vector_layer(in_vector_layer, feedback):
         """Method used to normalize the input vector layer
 
-        Two processing are used to normalized the input vector layer
-         - execute "Multi to single part" processing in order to accept even multi features
-         - execute "Drop  Z and M values" processing as they are not useful
+        The input vector layer is normalized in one pass over its features
+         - split the multi part features into single part features in order to accept even multi features
+         - drop the Z and M values as they are not useful
          - Validate if the resulting layer is Point LineString or Polygon
 
         :param in_vector_layer:  Input vector layer to normalize
@@ -231,30 +244,27 @@ class Simplify:
         :rtype Tuple of 2 values
         """
 
-        # Execute MultiToSinglePart processing
         feedback.pushInfo("Start normalizing input layer")
-        params = {'INPUT': in_vector_layer,
-                  'OUTPUT': 'memory:'}
-        result_ms = processing.run("native:multiparttosingleparts", params, feedback=feedback)
-        ms_part_layer = result_ms['OUTPUT']
-
-        # Execute Drop Z M processing
-        params = {'INPUT': ms_part_layer,
-                  'DROP_M_VALUES': True,
-                  'DROP_Z_VALUES': True,
-                  'OUTPUT': 'memory:'}
-        result_drop_zm = processing.run("native:dropmzvalues", params, feedback=feedback)
-        drop_zm_layer = result_drop_zm['OUTPUT']
-
-        # Extract the QgsFeature from the vector layer
         qgs_in_features = []
-        qgs_features = drop_zm_layer.getFeatures()
-        for qgs_feature in qgs_features:
-            qgs_in_features.append(qgs_feature)
+        for i, qgs_feature in enumerate(in_vector_layer.getFeatures()):
+            if (i & CANCEL_CHECK_MASK) == 0 and feedback.isCanceled():
+                break
+            if not qgs_feature.hasGeometry():
+                qgs_in_features.append(qgs_feature)  # Feature without geometry are kept as is
+                continue
+            # Create one feature for each part of the geometry
+            for qgs_geom_part in qgs_feature.geometry().asGeometryCollection():
+                qgs_abs_geom = qgs_geom_part.constGet().clone()
+                qgs_abs_geom.dropZValue()
+                qgs_abs_geom.dropMValue()
+                qgs_feature_part = QgsFeature(qgs_feature)
+                qgs_feature_part.setGeometry(QgsGeometry(qgs_abs_geom))
+                qgs_in_features.append(qgs_feature_part)
         if len(qgs_in_features) > 1:
             geom_type = qgs_in_features[0].geometry().wkbType()
         else:
-            geom_type = drop_zm_layer.wkbType()  # In case of empty layer
+            # In case of empty layer
+            geom_type = QgsWkbTypes.flatType(QgsWkbTypes.singleType(in_vector_layer.wkbType()))
         feedback.pushInfo("End normalizing input layer")
 
         return qgs_in_features, geom_type
@@ -277,31 +287,45 @@ class Simplify:
         return results
 
     @staticmethod
-    def find_farthest_point(qgs_points, first, last, ):
-        """Returns a tuple with the farthest point's index and it's distance from a subline section
+    def find_farthest_point(xy, first, last):
+        """Returns a tuple with the farthest point's index and it's squared distance from a subline section
+
+        The distances from the vertices to the segment [first, last] are computed all at once on the coordinate array.
+        Squared distances are used to avoid the square root; they must be compared against the squared tolerance.
 
-        :param: qgs_points: List of QgsPoint defining the line to process
-        :first: int: Index of the first point in qgs_points
-        :last: int: Index of the last point in qgs_points
-        :return: distance from the farthest point; index of the farthest point
+        :param: xy: Array of shape (2,N) containing the X and Y coordinates of the line to process
+        :first: int: Index of the first point in xy
+        :last: int: Index of the last point in xy
+        :return: index of the farthest point; squared distance from the farthest point
         :rtype: tuple of 2 values
         """
 
         if last - first >= 2:
-            qgs_geom_first_last = QgsLineString(qgs_points[first], qgs_points[last])
-            qgs_geom_engine = QgsGeometry.createGeometryEngine(qgs_geom_first_last)
-            distances = [qgs_geom_engine.distance(qgs_points[i]) for i in range(first + 1, last)]
-            farthest_dist = max(distances)
-            farthest_index = distances.index(farthest_dist) + first + 1
+            x0 = xy[0, first]
+            y0 = xy[1, first]
+            dx = xy[0, last] - x0
+            dy = xy[1, last] - y0
+            px = xy[0, first+1:last] - x0
+            py = xy[1, first+1:last] - y0
+            seg_len2 = dx*dx + dy*dy
+            if seg_len2 > 0.:
+                # Position of the projection on the segment clipped to the segment extremities
+                pos = np.clip((px*dx + py*dy) / seg_len2, 0., 1.)
+                px = px - pos*dx
+                py = py - pos*dy
+            distances2 = px*px + py*py
+            k = int(distances2.argmax())
+            farthest_dist2 = float(distances2[k])
+            farthest_index = first + 1 + k
         else:
             # Not enough vertice to calculate the farthest distance
-            farthest_dist = -1.
+            farthest_dist2 = -1.
             farthest_index = first
 
-        return farthest_index, farthest_dist
+        return farthest_index, farthest_dist2
 
-    __slots__ = ('tolerance', 'validate_structure', 'feedback', 'rb_collection', 'eps', 'rb_results', 'rb_geoms',
-                 'gs_features')
+    __slots__ = ('tolerance', 'tolerance2', 'validate_structure', 'feedback', 'rb_groups', 'eps', 'rb_results',
+                 'rb_geoms', 'gs_features', 'b_box_index', 'b_boxes')
 
     def __init__(self, qgs_in_features, tolerance, validate_structure, feedback):
         """Constructor for Simplify algorithm.
@@ -313,6 +337,9 @@ class Simplify:
        """
 
         self.tolerance = tolerance
+        # Squared tolerance used to compare squared distances.  The sign is kept so a negative tolerance still
+        # simplifies nothing, as no distance can be below it
+        self.tolerance2 = tolerance * tolerance if tolerance >= 0. else -(tolerance * tolerance)
         self.validate_structure = validate_structure
         self.feedback = feedback
 
@@ -332,26 +359,18 @@ class Simplify:
         :rtype: RbResult
         """
 
-        #  Code used for the profiler (uncomment if needed)
-#        import cProfile, pstats, io
-#        from pstats import SortKey
-#        pr = cProfile.Profile()
-#        pr.enable()
-
-        # Calculates the epsilon and initialize some stats and results value
-#        self.eps = Epsilon(self.qgs_in_features)
-#        self.eps.set_class_variables()
-#        self.rb_results = RbResults()
-
-#        # Create the list of GsPolygon, GsLineString and GsPoint to process
-#        self.gs_features = GeoSimUtil.create_gs_feature(self.qgs_in_features)
+        # Profile the algorithm when the GEOSIM_PROFILE environment variable is set (for debugging only)
+        profiler = None
+        if os.environ.get("GEOSIM_PROFILE"):
+            profiler = cProfile.Profile()
+            profiler.enable()
 
         # Pre process the LineString: remove to close point and co-linear points
         self.rb_geoms = self.pre_simplification_process()
 
-        # Create the GsCollection a spatial index to accelerate search for spatial relationships
-        self.rb_collection = GsCollection()
-        self.rb_collection.add_features(self.rb_geoms, self.feedback)
+        # Create the groups of geometries, each with its GsCollection a spatial index to accelerate search for
+        # spatial relationships
+        self.rb_groups = self.create_groups()
 
         # Execute the line simplification for each LineString
         self._simplify_lines()
@@ -365,23 +384,23 @@ class Simplify:
 
         # Validate inner spatial structure. For debug purpose only
         if self.rb_results.is_structure_valid:
-            self.rb_collection.validate_integrity(self.rb_geoms)
+            for lst_index, rb_collection in self.rb_groups:
+                rb_collection.validate_integrity([self.rb_geoms[i] for i in lst_index])
 
-        #  Code used for the profiler (uncomment if needed)
- #       pr.disable()
- #       s = io.StringIO()
- #       sortby = SortKey.CUMULATIVE
- #       ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
- #       ps.print_stats()
- #       print(s.getvalue())
+        if profiler is not None:
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
+            print(stream.getvalue())
 
         return self.rb_results
 
     def pre_simplification_process(self):
         """This method execute the pre simplification process
 
-        Pre simplification process applies only to closed line string and is used to find the 2 points that are
-        the distant from each other using the oriented bounding box
+        Pre simplification process creates the list of RbGeom to simplify from the GsFeatures and selects once
+        for each line string the method initializing its stack (open or closed line string).  The start of the
+        closed line string is not modified; the most distant vertex is found in init_closed_line_stack
 
         :return: List of rb_geom
         :rtype: [RbGeom]
@@ -392,38 +411,147 @@ class Simplify:
         for gs_feature in self.gs_features:
             sim_geoms += gs_feature.get_rb_geom()
 
+        # A line string stays open or closed during the simplification
+        for sim_geom in sim_geoms:
+            if sim_geom.original_geom_type != QgsWkbTypes.Point:
+                if sim_geom.qgs_geom.constGet().isClosed():
+                    sim_geom.init_stack = Simplify.init_closed_line_stack
+                else:
+                    sim_geom.init_stack = Simplify.init_open_line_stack
+
         return sim_geoms
 
+    def create_groups(self):
+        """Create the groups of geometries that can be simplified independently from each other
+
+        A geometry can only interact with the geometries of its own group, so each group has its own GsCollection.
+        The sets of interacting geometries are packed in about NBR_WORKERS groups with the same number of vertices.
+        When there are only a few geometries or when the tolerance is not positive (only the collinear vertices can be
+        deleted), all the geometries are placed in the same group as the gain does not pay for the partition.
+
+        :return: List of the index of the RbGeom and the GsCollection of each group
+        :rtype: [([int], GsCollection)]
+        """
+
+        # The spatial index of the bounding boxes is used for the partition and to find the geometries to process
+        # again after a geometry is modified
+        self.b_box_index, self.b_boxes = GeoSimUtil.create_b_box_index(self.rb_geoms)
+        if len(self.rb_geoms) >= MIN_NBR_GEOMS_PARALLEL and self.tolerance > 0.:
+            groups = GeoSimUtil.partition_rb_geoms(self.b_box_index, self.b_boxes)
+            weights = [rb_geom.qgs_geom.constGet().nCoordinates() for rb_geom in self.rb_geoms]
+            groups = GeoSimUtil.pack_groups(groups, weights, NBR_WORKERS)
+        else:
+            groups = [list(range(len(self.rb_geoms)))]
+
+        rb_groups = []
+        if len(groups) == 1:
+            rb_collection = GsCollection()
+            rb_collection.add_features(self.rb_geoms, self.feedback)
+            rb_groups.append((groups[0], rb_collection))
+        else:
+            progress_bar = ProgressBar(self.feedback, len(groups), "Building internal structure...")
+            for i, lst_index in enumerate(groups):
+                progress_bar.set_value(i)
+                rb_collection = GsCollection()
+                rb_collection.add_features([self.rb_geoms[j] for j in lst_index])
+                rb_groups.append((lst_index, rb_collection))
+
+        return rb_groups
+
     def _simplify_lines(self):
-        """Loop over the geometry until there is no more subline to simplify
+        """Simplify the geometries of each group
+
+        When there is more than one group, the groups are simplified in parallel as the simplification of one group
+        has no impact on the other groups (one after the other for QGIS versions older than 3.34).
+        """
+
+        # A geometry is dirty when itself or a geometry that can interact with it was modified since it was last
+        # processed.  The groups are independent so each one only updates the flags of its own geometries
+        dirties = [True] * len(self.rb_geoms)
+        if len(self.rb_groups) == 1:
+            lst_index, rb_collection = self.rb_groups[0]
+            nbr_pass, nbr_vertice_deleted = self._simplify_group(lst_index, rb_collection, dirties, self.feedback)
+        else:
+            nbr_pass = 0
+            nbr_vertice_deleted = 0
+            progress_bar = ProgressBar(self.feedback, len(self.rb_groups),
+                                       "Simplifying {0} groups of geometries".format(len(self.rb_groups)))
+            for i, (group_nbr_pass, group_nbr_vertice_deleted) in enumerate(self._simplify_groups(dirties)):
+                nbr_pass = max(nbr_pass, group_nbr_pass)
+                nbr_vertice_deleted += group_nbr_vertice_deleted
+                progress_bar.set_value(i+1)
+            self.feedback.pushInfo("Vertice deleted: {0}".format(nbr_vertice_deleted))
+
+        self.rb_results.nbr_pass = nbr_pass
+        self.rb_results.nbr_vertice_deleted = nbr_vertice_deleted
+
+        return
+
+    def _simplify_groups(self, dirties):
+        """Simplify the groups and yield the result of each group as soon as it is completed
+
+        :param: dirties: List of the dirty flag of each RbGeom
+        :return: Number of pass and number of vertice deleted of each group
+        :rtype: generator of tuple of int
+        """
+
+        if Qgis.QGIS_VERSION_INT >= MIN_QGIS_VERSION_PARALLEL:
+            with ThreadPoolExecutor(max_workers=len(self.rb_groups)) as executor:
+                futures = [executor.submit(self._simplify_group, lst_index, rb_collection, dirties)
+                           for lst_index, rb_collection in self.rb_groups]
+                for future in as_completed(futures):
+                    yield future.result()
+        else:
+            for lst_index, rb_collection in self.rb_groups:
+                yield self._simplify_group(lst_index, rb_collection, dirties)
+
+    def _simplify_group(self, lst_index, rb_collection, dirties, feedback=None):
+        """Loop over the geometry of a group until there is no more subline to simplify
 
         An iterative process for line simplification is applied in order to maximise line simplification.  The process
-        will always stabilize and exit when there are no more simplification to do.
+        will always stabilize and exit when there are no more simplification to do.  A geometry is processed again only
+        when a geometry whose bounding box intersects its own was modified, as the result would be the same otherwise.
+
+        :param: lst_index: List of the index of the RbGeom to simplify
+        :param: rb_collection: GsCollection containing the geometries of the group
+        :param: dirties: List of the dirty flag of each RbGeom
+        :param: feedback: QgsFeedback handle used to report each iteration; None when the group runs in a thread
+        :return: Number of iteration; number of vertice deleted
+        :rtype: tuple of 2 values
         """
 
+        nbr_pass = 0
+        total_vertice_deleted = 0
         while True:
-            progress_bar_value = 0
-            self.rb_results.nbr_pass += 1
-            progress_bar = ProgressBar(self.feedback, len(self.rb_geoms),
-                                       "Iteration: {0}".format(self.rb_results.nbr_pass))
+            nbr_pass += 1
+            progress_bar = ProgressBar(feedback, len(lst_index), "Iteration: {0}".format(nbr_pass))
             nbr_vertice_deleted = 0
-            for i, rb_geom in enumerate(self.rb_geoms):
-                if self.feedback.isCanceled():
+            for k, i in enumerate(lst_index):
+                if (k & CANCEL_CHECK_MASK) == 0 and self.feedback.isCanceled():
                     break
-                progress_bar.set_value(i)
-                if not rb_geom.is_simplest:  # Only process geometry that are not at simplest form
-                    nbr_vertice_deleted += self.process_line(rb_geom)
-
-            self.feedback.pushInfo("Vertice deleted: {0}".format(nbr_vertice_deleted))
+                progress_bar.set_value(k)
+                rb_geom = self.rb_geoms[i]
+                # Only process geometry that are not at simplest form and whose surrounding has changed
+                if not rb_geom.is_simplest and dirties[i]:
+                    dirties[i] = False
+                    nbr_deleted = self.process_line(rb_geom, rb_collection)
+                    if nbr_deleted >= 1:
+                        # The geometries that can interact with the modified geometry must be processed again
+                        for j in self.b_box_index.intersects(self.b_boxes[i]):
+                            dirties[j] = True
+                    nbr_vertice_deleted += nbr_deleted
+
+            if feedback is not None:
+                feedback.pushInfo("Vertice deleted: {0}".format(nbr_vertice_deleted))
 
             # While loop breaking condition (when no vertice deleted in a loop)
             if nbr_vertice_deleted == 0:
                 break
-            self.rb_results.nbr_vertice_deleted += nbr_vertice_deleted
+            total_vertice_deleted += nbr_vertice_deleted
 
-        return
+        return nbr_pass, total_vertice_deleted
 
-    def validate_constraints(self, sim_geom, first, last):
+    def validate_constraints(self, sim_geom, first, last, rb_collection):
         """Validate the spatial relationship in order maintain topological structure
 
         Three distinct spatial relation are tested in order to assure that each bend reduce will continue to maintain
@@ -442,121 +570,221 @@ class Simplify:
         :param: sim_geom: Geometry used to validate constraints
         :param: first: Index of the start vertice of the subline
         :param: last: Index of the last vertice of the subline
+        :param: rb_collection: GsCollection containing the geometries that can interact with sim_geom
         :return: Flag indicating if the spatial constraints are valid for this subline simplification
         :rtype: Bool
         """
 
         constraints_valid = True
 
-        qgs_points = [sim_geom.qgs_geom.vertexAt(i) for i in range(first, last+1)]
+        # The QgsLineString of the old subline is created once; the other geometries are cloned from it
+        qgs_points = sim_geom.qgs_points[first:last+1]
         qgs_geom_new_subline = QgsGeometry(QgsLineString(qgs_points[0], qgs_points[-1]))
         qgs_geom_old_subline = QgsGeometry(QgsLineString(qgs_points))
         qgs_geoms_with_itself, qgs_geoms_with_others = \
-            self.rb_collection.get_segment_intersect(sim_geom.id, qgs_geom_old_subline.boundingBox(),
+            rb_collection.get_segment_intersect(sim_geom.id, qgs_geom_old_subline.boundingBox(),
                                                      qgs_geom_old_subline)
 
+        # The same geometry engine is used to validate the simplicity and the intersection
+        geom_engine_subline = QgsGeometry.createGeometryEngine(qgs_geom_new_subline.constGet().clone())
+
         # First: check if the bend reduce line string is an OGC simple line
-        constraints_valid = GeoSimUtil.validate_simplicity(qgs_geoms_with_itself, qgs_geom_new_subline)
+        constraints_valid = GeoSimUtil.validate_simplicity(qgs_geoms_with_itself, qgs_geom_new_subline,
+                                                           geom_engine_subline)
 
         # Second: check that the new line does not intersect with any other line or points
         if constraints_valid and len(qgs_geoms_with_others) >= 1:
-            constraints_valid = GeoSimUtil.validate_intersection(qgs_geoms_with_others, qgs_geom_new_subline)
+            constraints_valid = GeoSimUtil.validate_intersection(qgs_geoms_with_others, qgs_geom_new_subline,
+                                                                 geom_engine_subline)
 
         # Third: check that inside the subline to simplify there is no feature completely inside it.  This would cause a
         # sidedness or relative position error
         if constraints_valid and len(qgs_geoms_with_others) >= 1:
-            qgs_ls_old_subline = QgsLineString(qgs_points)
-            qgs_ls_old_subline.addVertex(qgs_points[0])  # Close the line with the start point
-            qgs_geom_old_subline = QgsGeometry(qgs_ls_old_subline.clone())
+            if GeoSimUtil.is_ring_simple(sim_geom.xy[:, first:last+1]):
+                # The closed subline is simple; it forms the polygon without unary union and polygonize
+                qgs_geom_polygon = QgsGeometry(QgsPolygon(qgs_geom_old_subline.constGet().clone()))  # Closes the ring
+                constraints_valid = GeoSimUtil.validate_sidedness(qgs_geoms_with_others, qgs_geom_polygon)
+            else:
+                qgs_ls_closed_subline = qgs_geom_old_subline.constGet().clone()
+                qgs_ls_closed_subline.addVertex(qgs_points[0])  # Close the line with the start point
+                qgs_geom_closed_subline = QgsGeometry(qgs_ls_closed_subline)
 
-            # Next two lines used to transform a self intersecting line into a valid MultiPolygon
-            qgs_geom_unary = QgsGeometry.unaryUnion([qgs_geom_old_subline])
-            qgs_geom_polygonize = QgsGeometry.polygonize([qgs_geom_unary])
+                # Next two lines used to transform a self intersecting line into a valid MultiPolygon
+                qgs_geom_unary = QgsGeometry.unaryUnion([qgs_geom_closed_subline])
+                qgs_geom_polygonize = QgsGeometry.polygonize([qgs_geom_unary])
 
-            if qgs_geom_polygonize.isSimple():
-                constraints_valid = GeoSimUtil.validate_sidedness(qgs_geoms_with_others, qgs_geom_polygonize)
-            else:
-                print("Polygonize not valid")
-                constraints_valid = False
+                if qgs_geom_polygonize.isSimple():
+                    constraints_valid = GeoSimUtil.validate_sidedness(qgs_geoms_with_others, qgs_geom_polygonize)
+                else:
+                    print("Polygonize not valid")
+                    constraints_valid = False
 
         return constraints_valid
 
     @staticmethod
-    def init_process_line_stack(is_line_closed, qgs_points):
-        """Method that initialize the stack used to simulate recursivity to simplify the line
+    def init_open_line_stack(xy):
+        """Method that initialize the stack used to simulate recursivity to simplify an open line
 
-        :param: is_closed: Boolean to indicate if the feature is closed or open
-        :param: qgs_points: List of QgsPoints forming the line string to simplify
+        :param: xy: Array of shape (2,N) containing the X and Y coordinates of the line string to simplify
+        :return: Stack used to initiate the line simplification process
+        :rtype: List of tuple
+        """
+
+        return [(0, xy.shape[1] - 1)]
+
+    @staticmethod
+    def init_closed_line_stack(xy):
+        """Method that initialize the stack used to simulate recursivity to simplify a closed line
+
+        The closed line is split at the vertex most distant from the first vertex and each half is split again at
+        its farthest point
+
+        :param: xy: Array of shape (2,N) containing the X and Y coordinates of the line string to simplify
         :return: Stack used to initiate the line simplification process
         :rtype: List of tuple
         """
 
         stack = []
-        last_index = len(qgs_points) - 1
-        if is_line_closed:
-            # Initialize stack for a closed line string
-            if last_index >= 4:
-                x = qgs_points[0].x()
-                y = qgs_points[0].y()
-                lst_distance = [qgs_point.distance(x, y) for qgs_point in qgs_points]
-                mid_index = lst_distance.index(max(lst_distance))  # Most distant vertex position
-
-                (farthest_index_a, farthest_dist_a) = Simplify.find_farthest_point(qgs_points, 0, mid_index)
-                (farthest_index_b, farthest_dist_b) = Simplify.find_farthest_point(qgs_points, mid_index, last_index)
-                if farthest_dist_a > 0.:
-                    stack.append((0, farthest_index_a))
-                    stack.append((farthest_index_a, mid_index))
-                if farthest_dist_b > 0.:
-                    stack.append((mid_index, farthest_index_b))
-                    stack.append((farthest_index_b, last_index))
-            else:
-                # Not enough vertice... nothing to simplify
-                pass
+        last_index = xy.shape[1] - 1
+        if last_index >= 4:
+            delta_x = xy[0] - xy[0, 0]
+            delta_y = xy[1] - xy[1, 0]
+            mid_index = int((delta_x*delta_x + delta_y*delta_y).argmax())  # Most distant vertex position
+
+            (farthest_index_a, farthest_dist2_a) = Simplify.find_farthest_point(xy, 0, mid_index)
+            (farthest_index_b, farthest_dist2_b) = Simplify.find_farthest_point(xy, mid_index, last_index)
+            if farthest_dist2_a > 0.:
+                stack.append((0, farthest_index_a))
+                stack.append((farthest_index_a, mid_index))
+            if farthest_dist2_b > 0.:
+                stack.append((mid_index, farthest_index_b))
+                stack.append((farthest_index_b, last_index))
         else:
-            # Initialize stack for an open line string
-            stack.append((0, last_index))
+            # Not enough vertice... nothing to simplify
+            pass
 
         return stack
 
-    def process_line(self, sim_geom):
+    def process_line(self, sim_geom, rb_collection):
         """This method is simplifying a line with the Douglas Peucker algorithm and spatial constraints.
 
         Important note: The line is always simplified for the end of the line to the start of the line. This helps
         maintain the relative position of the vertice in the line
 
         :param: sim_geom: GeoSim object to simplify
+        :param: rb_collection: GsCollection containing the geometries that can interact with sim_geom
         :return: Number of vertice deleted
         :rtype: int
         """
 
-        qgs_line_string = sim_geom.qgs_geom.constGet()
-        qgs_points = qgs_line_string.points()
+        xy = sim_geom.xy
 
         # Initialize the stack that simulate recursivity
-        stack = Simplify.init_process_line_stack(qgs_line_string.isClosed(), qgs_points)
+        stack = sim_geom.init_stack(xy)
 
-        # Loop over the stack to simplify the line
+        # Find the sublines to simplify without the spatial constraints. The sublines are ordered from the end to
+        # the start of the line
+        sublines = find_sublines(xy, np.asarray(stack, dtype=np.int64).reshape(-1, 2), self.tolerance2)
+
+        # Loop over each subline to validate the spatial constraints
         sim_geom.is_simplest = True
         nbr_vertice_deleted = 0
-        while stack:
-            (first, last) = stack.pop()
-            if first + 1 < last:  # The segment to check has only 2 points
-                (farthest_index, farthest_dist) = Simplify.find_farthest_point(qgs_points, first, last)
-                if farthest_dist <= self.tolerance:
-                    if self.validate_constraints(sim_geom, first, last):
-                        nbr_vertice_deleted += last - first - 1
-                        self.rb_collection.delete_vertex(sim_geom, first + 1, last - 1)
+        for subline in sublines:
+            # The farthest point of the subline is already known; it's searched only for the split sublines
+            stack = [subline]
+            while stack:
+                (first, last, farthest_index, farthest_dist2) = stack.pop()
+                if first + 1 < last:  # The segment to check has only 2 points
+                    if farthest_index is None:
+                        (farthest_index, farthest_dist2) = Simplify.find_farthest_point(xy, first, last)
+                    if farthest_dist2 <= self.tolerance2:
+                        if self.validate_constraints(sim_geom, first, last, rb_collection):
+                            nbr_vertice_deleted += last - first - 1
+                            rb_collection.delete_vertex(sim_geom, first + 1, last - 1)
+                        else:
+                            sim_geom.is_simplest = False  # The line string is not at its simplest form
+                            # In case of non respect of spatial constraints split and stack again the sub lines
+                            # using the farthest point already found for this subline
+                            stack.append((first, farthest_index, None, None))
+                            stack.append((farthest_index, last, None, None))
                     else:
-                        sim_geom.is_simplest = False  # The line string is not at its simplest form
-                        # In case of non respect of spatial constraints split and stack again the sub lines
-                        (farthest_index, farthest_dist) = Simplify.find_farthest_point(qgs_points, first, last)
-                        if farthest_dist <= self.tolerance:
-                            # Stack for the net iteration
-                            stack.append((first, farthest_index))
-                            stack.append((farthest_index, last))
-                else:
-                    # Stack for the iteration
-                    stack.append((first, farthest_index))
-                    stack.append((farthest_index, last))
+                        # Stack for the iteration
+                        stack.append((first, farthest_index, None, None))
+                        stack.append((farthest_index, last, None, None))
 
         return nbr_vertice_deleted
+
+
+# --------------------------------------------------------
+# Geometric core of the Douglas-Peucker algorithm (compiled with Numba when available)
+# --------------------------------------------------------
+
+def _find_farthest_point_scalar(xy, first, last):
+    """Scalar version of Simplify.find_farthest_point intended to be compiled by Numba
+
+    :param: xy: Array of shape (2,N) containing the X and Y coordinates of the line to process
+    :first: int: Index of the first point in xy
+    :last: int: Index of the last point in xy
+    :return: index of the farthest point; squared distance from the farthest point
+    :rtype: tuple of 2 values
+    """
+
+    farthest_index = first
+    farthest_dist2 = -1.
+    x0 = xy[0, first]
+    y0 = xy[1, first]
+    dx = xy[0, last] - x0
+    dy = xy[1, last] - y0
+    seg_len2 = dx*dx + dy*dy
+    for i in range(first+1, last):
+        px = xy[0, i] - x0
+        py = xy[1, i] - y0
+        if seg_len2 > 0.:
+            # Position of the projection on the segment clipped to the segment extremities
+            pos = min(max((px*dx + py*dy) / seg_len2, 0.), 1.)
+            px = px - pos*dx
+            py = py - pos*dy
+        dist2 = px*px + py*py
+        if dist2 > farthest_dist2:
+            farthest_index = i
+            farthest_dist2 = dist2
+
+    return farthest_index, farthest_dist2
+
+
+def find_sublines(xy, init_stack, tolerance2):
+    """Find the sublines to simplify using only the distance criteria of the Douglas-Peucker algorithm
+
+    The spatial constraints are not validated here; the sublines returned are candidates that still need to be
+    validated. The sublines are returned in the order they are processed (from the end to the start of the line)
+
+    :param: xy: Array of shape (2,N) containing the X and Y coordinates of the line to process
+    :param: init_stack: Array of shape (M,2) containing the first/last index of the sublines to start with
+    :param: tolerance2: Squared tolerance of the Douglas-Peucker algorithm
+    :return: List of the first/last index of each subline to simplify with the index and squared distance of its
+             farthest point
+    :rtype: List of tuple of 4 values
+    """
+
+    stack = [(int(init_stack[i, 0]), int(init_stack[i, 1])) for i in range(init_stack.shape[0])]
+    sublines = []
+    while stack:
+        (first, last) = stack.pop()
+        if first + 1 < last:  # The segment to check has only 2 points
+            (farthest_index, farthest_dist2) = _find_farthest_point(xy, first, last)
+            if farthest_dist2 <= tolerance2:
+                sublines.append((first, last, farthest_index, farthest_dist2))
+            else:
+                stack.append((first, farthest_index))
+                stack.append((farthest_index, last))
+
+    return sublines
+
+
+if njit is None:
+    _find_farthest_point = Simplify.find_farthest_point
+else:
+    # cache=True writes the compiled functions in the __pycache__ directory of the plugin (or in the user cache
+    # directory when the plugin directory is read-only; NUMBA_CACHE_DIR overrides both)
+    _find_farthest_point = njit(cache=True, boundscheck=False)(_find_farthest_point_scalar)
+    find_sublines = njit(cache=True, boundscheck=False)(find_sublines)
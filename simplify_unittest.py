@@ -24,8 +24,13 @@ Unit test for simplify algorithm
 """
 
 import unittest
+from unittest import mock
+import math
+import numpy as np
 from qgis.core import QgsApplication
+from . import simplify_algorithm
 from .simplify_algorithm import Simplify
+from .geo_sim_util import Epsilon, GeoSimUtil, RbGeom, ProgressBar
 from qgis.core import QgsPoint, QgsLineString, QgsPolygon, QgsFeature, QgsGeometry, QgsProcessingFeedback, \
                       QgsVectorLayer, QgsWkbTypes, QgsPointXY
 from qgis.analysis import QgsNativeAlgorithms
@@ -73,6 +78,10 @@ def build_and_launch(title, qgs_geoms, tolerance):
 
     return qgs_geoms_out
 
+def create_xy(coords):
+
+    return np.array(coords, dtype=np.float64).T
+
 def create_line(coords, ret_geom=True):
 
     qgs_points = []
@@ -109,6 +118,36 @@ def create_polygon(outer, inners):
     return qgs_geom
 
 
+def create_vector_layer(geom_type, qgs_geoms):
+
+    vl = QgsVectorLayer(geom_type + "?field=id:integer", "temporary_layer", "memory")
+    pr = vl.dataProvider()
+    qgs_features = []
+    for i, qgs_geom in enumerate(qgs_geoms):
+        qgs_feature = QgsFeature(vl.fields())
+        qgs_feature.setAttributes([i])
+        if qgs_geom is not None:
+            qgs_feature.setGeometry(qgs_geom)
+        qgs_features.append(qgs_feature)
+    pr.addFeatures(qgs_features)
+    vl.updateExtents()
+
+    return vl
+
+
+class FeedbackRecorder:
+    """Feedback recording the values sent to the progress bar"""
+
+    def __init__(self):
+        self.progress_values = []
+
+    def setProgress(self, value):
+        self.progress_values.append(value)
+
+    def pushInfo(self, info):
+        pass
+
+
 class Test(unittest.TestCase):
     """
     Class allowing to test the algorithm
@@ -392,6 +431,185 @@ class Test(unittest.TestCase):
         val4 = out_qgs_geom4.equals(qgs_feature_out[4])
         self.assertTrue (val0 and val1 and val2 and val3 and val4, title)
 
+    def test_case30(self):
+        title = "Test 30: Partition in groups: two disjoint clusters and one chained cluster"
+        coords = [[(0, 0), (1, 1)],           # Cluster A
+                  [(10, 0), (11, 1)],         # Cluster B
+                  [(20, 0), (21, 1)],         # Chained cluster C
+                  [(.5, .5), (2, 0)],         # Cluster A
+                  [(24, 0), (25, 1)],         # Chained cluster C (linked to the first line of C by the next line)
+                  [(10.5, 0), (10.5, 2)],     # Cluster B
+                  [(20.5, .5), (24.5, .5)]]   # Chained cluster C (bounding box intersects both lines of C)
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        rb_geoms = [RbGeom(create_line(coord), QgsWkbTypes.LineString) for coord in coords]
+        b_box_index, b_boxes = GeoSimUtil.create_b_box_index(rb_geoms)
+        groups = GeoSimUtil.partition_rb_geoms(b_box_index, b_boxes)
+        val0 = groups == [[0, 3], [1, 5], [2, 4, 6]]
+        # Geometries to process again when a line of C is modified: the last line of C links the two other lines
+        val1 = [sorted(b_box_index.intersects(b_boxes[i])) for i in groups[2]] == [[2, 6], [4, 6], [2, 4, 6]]
+        self.assertTrue (val0 and val1, title)
+
+    def test_case31(self):
+        title = "Test 31: Progress bar values are the same as int(value/max_value*100)"
+        val0 = True
+        for max_value in (1, 7, 100, 1000):
+            feedback = FeedbackRecorder()
+            progress_bar = ProgressBar(feedback, max_value, "")
+            expected_values = [0]
+            for value in range(max_value+1):
+                progress_bar.set_value(value)
+                percent_value = int(value/max_value*100.)
+                if percent_value != expected_values[-1]:
+                    expected_values.append(percent_value)
+            if feedback.progress_values != expected_values:
+                val0 = False
+        self.assertTrue (val0, title)
+
+    def test_case32(self):
+        title = "Test 32: Ring simplicity: simple ring"
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        val0 = GeoSimUtil.is_ring_simple(create_xy([(0, 0), (0, 5), (3, 6), (5, 5), (5, 0)]))
+        self.assertTrue (val0, title)
+
+    def test_case33(self):
+        title = "Test 33: Ring simplicity: crossing ring"
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        val0 = GeoSimUtil.is_ring_simple(create_xy([(0, 0), (5, 5), (5, 0), (0, 5)]))
+        self.assertFalse (val0, title)
+
+    def test_case34(self):
+        title = "Test 34: Ring simplicity: ring folding back on a collinear segment"
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        val0 = GeoSimUtil.is_ring_simple(create_xy([(0, 0), (5, 0), (3, 0), (3, 3)]))
+        self.assertFalse (val0, title)
+
+    def test_case35(self):
+        title = "Test 35: Ring simplicity: ring touching itself on a vertex"
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        val0 = GeoSimUtil.is_ring_simple(create_xy([(0, 0), (2, 2), (4, 0), (4, 4), (2, 2), (0, 4)]))
+        self.assertFalse (val0, title)
+
+    def test_case36(self):
+        title = "Test 36: Ring simplicity: ring with a degenerated segment"
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        val0 = GeoSimUtil.is_ring_simple(create_xy([(0, 0), (0, 5), (0, 5), (5, 5), (5, 0)]))
+        self.assertFalse (val0, title)
+
+    def test_case37(self):
+        title = "Test 37: Ring simplicity: ring with too many segments is left to GEOS"
+        Epsilon([]).set_class_variables()  # Zero of a unit bounding box
+        coords = [(math.cos(i*2.*math.pi/200), math.sin(i*2.*math.pi/200)) for i in range(200)]
+        val0 = GeoSimUtil.is_ring_simple(create_xy(coords))
+        val1 = GeoSimUtil.is_ring_simple(create_xy(coords), max_nbr_segment=256)
+        self.assertTrue (not val0 and val1, title)
+
+    def test_case38(self):
+        title = "Test 38: Line blocked by a line simplified later in the same pass is simplified in the next pass"
+        qgs_geom0 = create_line([(0, 0), (2, 2), (4, 0)])
+        qgs_geom1 = create_line([(1, -1), (2, 1), (3, -1)])
+        qgs_feature_out = build_and_launch(title, [qgs_geom0, qgs_geom1], 3)
+        out_qgs_geom0 = create_line([(0, 0), (4, 0)])
+        out_qgs_geom1 = create_line([(1, -1), (3, -1)])
+        val0 = out_qgs_geom0.equals(qgs_feature_out[0])
+        val1 = out_qgs_geom1.equals(qgs_feature_out[1])
+        self.assertTrue (val0 and val1, title)
+
+    def test_case39(self):
+        title = "Test 39: Normalization of in vector layer: multipart feature"
+        vl = create_vector_layer("MultiLineString", [QgsGeometry.fromWkt("MultiLineString((0 0, 1 1),(2 2, 3 3))")])
+        qgs_features, geom_type = Simplify.normalize_in_vector_layer(vl, QgsProcessingFeedback())
+        val0 = len(qgs_features) == 2 and geom_type == QgsWkbTypes.LineString
+        val1 = create_line([(0, 0), (1, 1)]).equals(qgs_features[0].geometry())
+        val2 = create_line([(2, 2), (3, 3)]).equals(qgs_features[1].geometry())
+        val3 = [qgs_feature.attributes() for qgs_feature in qgs_features] == [[0], [0]]
+        self.assertTrue (val0 and val1 and val2 and val3, title)
+
+    def test_case40(self):
+        title = "Test 40: Normalization of in vector layer: feature with Z and M values"
+        vl = create_vector_layer("LineStringZM", [QgsGeometry.fromWkt("LineString ZM (0 0 1 2, 1 1 3 4)")])
+        qgs_features, geom_type = Simplify.normalize_in_vector_layer(vl, QgsProcessingFeedback())
+        val0 = len(qgs_features) == 1 and geom_type == QgsWkbTypes.LineString
+        val1 = qgs_features[0].geometry().wkbType() == QgsWkbTypes.LineString
+        val2 = create_line([(0, 0), (1, 1)]).equals(qgs_features[0].geometry())
+        self.assertTrue (val0 and val1 and val2, title)
+
+    def test_case41(self):
+        title = "Test 41: Normalization of in vector layer: feature without geometry"
+        vl = create_vector_layer("LineString", [create_line([(0, 0), (1, 1)]), None])
+        qgs_features, geom_type = Simplify.normalize_in_vector_layer(vl, QgsProcessingFeedback())
+        val0 = len(qgs_features) == 2 and geom_type == QgsWkbTypes.LineString
+        val1 = qgs_features[0].hasGeometry() and not qgs_features[1].hasGeometry()
+        val2 = qgs_features[1].attributes() == [1]
+        self.assertTrue (val0 and val1 and val2, title)
+
+    def test_case42(self):
+        title = "Test 42: Normalization of in vector layer: empty layer"
+        vl = create_vector_layer("MultiLineStringZ", [])
+        qgs_features, geom_type = Simplify.normalize_in_vector_layer(vl, QgsProcessingFeedback())
+        val0 = len(qgs_features) == 0 and geom_type == QgsWkbTypes.LineString
+        self.assertTrue (val0, title)
+
+    def test_case43(self):
+        title = "Test 43: Normalization of in vector layer: canceled processing"
+        vl = create_vector_layer("LineString", [create_line([(0, 0), (1, 1)])])
+        feedback = QgsProcessingFeedback()
+        feedback.cancel()
+        qgs_features, _ = Simplify.normalize_in_vector_layer(vl, feedback)
+        self.assertEqual(len(qgs_features), 0, title)
+
+    def test_case44(self):
+        title = "Test 44: Negative tolerance: no simplification"
+        qgs_geom0 = create_line([(0, 0), (5, 1), (10, 0)])
+        qgs_feature_out = build_and_launch(title, [qgs_geom0], -3)
+        out_qgs_geom0 = create_line([(0, 0), (5, 1), (10, 0)])
+        val0 = out_qgs_geom0.equals(qgs_feature_out[0])
+        self.assertTrue (val0, title)
+
+    @unittest.skipIf(simplify_algorithm.njit is None, "Numba is not installed")
+    def test_case45(self):
+        title = "Test 45: Sublines found by the Numba compiled code are the same as with Python and NumPy"
+        rng = np.random.default_rng(0)
+        lst_xy = []
+        for nbr_vertice in (3, 10, 50, 200):
+            # Open line: random walk
+            lst_xy.append(np.cumsum(rng.normal(size=(2, nbr_vertice)), axis=1))
+            # Closed line: noisy circle with the last vertex equal to the first one
+            angles = np.linspace(0., 2.*math.pi, nbr_vertice, endpoint=False)
+            radius = 10. + rng.normal(size=nbr_vertice)
+            xy = np.array([radius*np.cos(angles), radius*np.sin(angles)])
+            lst_xy.append(np.concatenate((xy, xy[:, :1]), axis=1))
+        val0 = True
+        for xy in lst_xy:
+            if xy[0, 0] == xy[0, -1] and xy[1, 0] == xy[1, -1]:
+                stack = Simplify.init_closed_line_stack(xy)
+            else:
+                stack = Simplify.init_open_line_stack(xy)
+            init_stack = np.asarray(stack, dtype=np.int64).reshape(-1, 2)
+            for tolerance in (.1, 1., 5.):
+                sublines_njit = simplify_algorithm.find_sublines(xy, init_stack, tolerance*tolerance)
+                with mock.patch.object(simplify_algorithm, "_find_farthest_point", Simplify.find_farthest_point):
+                    sublines_numpy = simplify_algorithm.find_sublines.py_func(xy, init_stack, tolerance*tolerance)
+                if sublines_njit != sublines_numpy:
+                    val0 = False
+        self.assertTrue (val0, title)
+
+    def test_case46(self):
+        title = "Test 46: Isolated geometries packed in 2 groups simplified separately"
+        qgs_geoms = []
+        out_qgs_geoms = []
+        for i in range(8):
+            qgs_geoms.append(create_line([(20*i, 0), (20*i+5, 1), (20*i+10, 0)]))
+            out_qgs_geoms.append(create_line([(20*i, 0), (20*i+10, 0)]))
+        simplify_group = Simplify._simplify_group
+        with mock.patch.object(simplify_algorithm, "NBR_WORKERS", 2), \
+             mock.patch.object(Simplify, "_simplify_group", autospec=True, side_effect=simplify_group) as mock_group:
+            qgs_feature_out = build_and_launch(title, qgs_geoms, 3)
+        val0 = mock_group.call_count == 2
+        # Each group contains 4 of the 8 geometries
+        val1 = sorted(len(call[0][1]) for call in mock_group.call_args_list) == [4, 4]
+        val2 = all(out_qgs_geom.equals(qgs_geom) for out_qgs_geom, qgs_geom in zip(out_qgs_geoms, qgs_feature_out))
+        self.assertTrue (val0 and val1 and val2 and len(qgs_feature_out) == 8, title)
+
 
 
 